@@ -145,6 +145,61 @@ def get_reseller_discount(user_id: int, product_type: str) -> Decimal:
     
     return discount
 
+def get_reseller_discounts_bulk(user_id: int, product_types: set, conn=None) -> dict:
+    """Fetches discount percentages for several product types in one go.
+    Returns {product_type: Decimal}; types without a discount map to 0%.
+    Pass `conn` to reuse an existing connection (it is left open)."""
+    discounts = {ptype: Decimal('0.0') for ptype in product_types}
+    if not product_types:
+        return discounts
+    own_conn = conn is None
+    types_list = list(product_types)
+    placeholders = ','.join('?' * len(types_list))
+    max_retries = 3
+    retry_delay = 0.1  # 100ms
+
+    for attempt in range(max_retries):
+        try:
+            if own_conn:
+                conn = get_db_connection()
+            c = conn.cursor()
+            c.execute("SELECT is_reseller FROM users WHERE user_id = ?", (user_id,))
+            res = c.fetchone()
+            if not res or res['is_reseller'] != 1:
+                break
+
+            c.execute(f"""
+                SELECT product_type, discount_percentage FROM reseller_discounts
+                WHERE reseller_user_id = ? AND product_type IN ({placeholders})
+            """, (user_id, *types_list))
+            for row in c.fetchall():
+                discounts[row['product_type']] = Decimal(str(row['discount_percentage']))
+
+            # Success - break out of retry loop
+            break
+
+        except sqlite3.Error as e:
+            if "database is locked" in str(e).lower() and attempt < max_retries - 1:
+                logger.warning(f"Database locked for bulk reseller discount check (attempt {attempt + 1}/{max_retries}), retrying in {retry_delay}s...")
+                if own_conn and conn:
+                    conn.close()
+                    conn = None
+                time.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+                continue
+            else:
+                logger.error(f"DB error fetching bulk reseller discounts for user {user_id}: {e}")
+                break
+        except Exception as e:
+            logger.error(f"Unexpected error fetching bulk reseller discounts: {e}", exc_info=True)
+            break
+        finally:
+            if own_conn and conn:
+                conn.close()
+                conn = None
+
+    return discounts
+
 
 # ==================================
 # --- Admin: Manage Reseller Status --- (REVISED FLOW)
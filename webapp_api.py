@@ -3,28 +3,57 @@ Telegram Mini App - Flask API Server
 Lightweight REST API for the shopping mini app
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+import orjson
 import sqlite3
 import hashlib
 import hmac
 import urllib.parse
 import os
+import json
+import time
 import logging
+import queue
+import threading
+from contextlib import closing
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from operator import itemgetter
 from decimal import Decimal
 from datetime import datetime, timezone
 
 # Import from existing modules
-from utils import get_db_connection, CITIES, DISTRICTS, PRODUCT_TYPES, load_all_data
-from reseller_management import get_reseller_discount
+from utils import get_db_connection, DATABASE_PATH, CITIES, DISTRICTS, PRODUCT_TYPES, load_all_data
+from reseller_management import get_reseller_discount, get_reseller_discounts_bulk
 from user import validate_and_apply_discount_atomic
 
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (much faster than stdlib json)"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__, static_folder='static', static_url_path='')
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
+# No key sorting or pretty-printing: the orjson options above omit OPT_SORT_KEYS/OPT_INDENT_2
 CORS(app)
 
 # Configuration
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
 MEDIA_DIR = os.getenv('MEDIA_DIR', '/mnt/data/media')
+MEDIA_CACHE_MAX_AGE = 86400  # Seconds clients may cache product media
+PRODUCTS_STREAM_BATCH = 50  # Products serialized per streamed write
+
+# initData HMAC key depends only on the bot token - derive it once
+_TG_SECRET_KEY = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest() if BOT_TOKEN else None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -32,33 +61,145 @@ logger = logging.getLogger(__name__)
 # Load data on startup
 load_all_data()
 
+# Read-only lookup: (city_id, district_id) -> district name
+DISTRICT_BY_CITY_DISTRICT = {
+    (city_id, dist_id): dist_name
+    for city_id, districts in DISTRICTS.items()
+    for dist_id, dist_name in districts.items()
+}
+
+CATALOG_CACHE_MAX_AGE = 300  # Seconds clients may reuse catalog responses
+
+
+def _catalog_entry(payload: dict) -> tuple[bytes, str]:
+    """Serialize a catalog payload once, returning (body, etag)"""
+    body = orjson.dumps(payload)
+    return body, hashlib.md5(body).hexdigest()
+
+
+# Catalog data doesn't change while the API runs - serialize it once
+_CITIES_ENTRY = _catalog_entry({
+    'success': True,
+    'cities': [{'id': city_id, 'name': city_name} for city_id, city_name in CITIES.items()]
+})
+_DISTRICTS_ENTRIES = {
+    city_id: _catalog_entry({
+        'success': True,
+        'districts': [{'id': dist_id, 'name': dist_name} for dist_id, dist_name in districts.items()]
+    })
+    for city_id, districts in DISTRICTS.items()
+}
+_NO_DISTRICTS_ENTRY = _catalog_entry({'success': True, 'districts': []})
+_PRODUCT_TYPES_ENTRY = _catalog_entry({
+    'success': True,
+    'types': [{'name': type_name, 'emoji': emoji} for type_name, emoji in PRODUCT_TYPES.items()]
+})
+
+# SQL statements - kept as fixed module constants so each one hits the
+# connection's statement cache by exact text
+# First media type is fetched inline (one query instead of one per product)
+SQL_PRODUCTS_BASE = """
+    SELECT id, city, district, product_type, size, price, 
+           (available - reserved) as in_stock,
+           (SELECT pm.media_type FROM product_media pm
+            WHERE pm.product_id = p.id ORDER BY pm.id LIMIT 1) as media_type
+    FROM products p
+    WHERE available > reserved
+"""
+SQL_PRODUCT_DETAILS = """
+    SELECT id, city, district, product_type, size, price, 
+           original_text, (available - reserved) as in_stock
+    FROM products 
+    WHERE id = ? AND available > reserved
+"""
+SQL_PRODUCT_MEDIA = "SELECT media_type, telegram_file_id AS file_id FROM product_media WHERE product_id = ?"
+SQL_USER_BASKET = "SELECT basket FROM users WHERE user_id = ?"
+SQL_BASKET_PRODUCTS = """
+    SELECT id, product_type, size, price, city, district
+    FROM products 
+    WHERE id IN ({placeholders})
+"""
+SQL_UNRESERVE_PRODUCT = "UPDATE products SET reserved = MAX(reserved - ?, 0) WHERE id = ? AND reserved > 0"
+SQL_CLEAR_BASKET = "UPDATE users SET basket = '' WHERE user_id = ?"
+SQL_USER_BALANCE = "SELECT balance FROM users WHERE user_id = ?"
+
+
+@lru_cache(maxsize=16)
+def _products_sql(has_city: bool, has_district: bool, has_type: bool) -> str:
+    """Assemble the product listing SQL once per filter combination"""
+    query = SQL_PRODUCTS_BASE
+    if has_city:
+        query += " AND city = ?"
+    if has_district:
+        query += " AND district = ?"
+    if has_type:
+        query += " AND product_type = ?"
+    return query + " ORDER BY id DESC LIMIT 100"
+
+
+# Pool of reusable SQLite connections shared by all request threads (keeps
+# PRAGMA state and statement cache). Idle connections beyond DB_POOL_SIZE are closed.
+DB_POOL_SIZE = 10
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+# journal_mode=WAL is persistent in the database file - set it once at startup
+with closing(get_db_connection()) as _wal_conn:
+    _wal_conn.execute("PRAGMA journal_mode=WAL")
+
+
+def _make_pooled_connection():
+    """Open a connection that may be handed between request threads"""
+    conn = sqlite3.connect(DATABASE_PATH, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def get_pooled_connection():
+    """Return the current request's DB connection, taking one from the pool on first use"""
+    if 'db_conn' not in g:
+        try:
+            g.db_conn = _db_pool.get_nowait()
+        except queue.Empty:
+            g.db_conn = _make_pooled_connection()
+    return g.db_conn
+
+
+@app.teardown_request
+def release_pooled_connection(exc):
+    """Roll back anything left open and hand the connection back to the pool"""
+    conn = g.pop('db_conn', None)
+    if conn is None:
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _db_pool.put_nowait(conn)
+    except (sqlite3.Error, queue.Full):
+        conn.close()
+
 
 def validate_telegram_webapp_data(init_data: str) -> dict | None:
     """Validate Telegram WebApp initData and extract user info"""
+    if _TG_SECRET_KEY is None:
+        logger.error("TELEGRAM_BOT_TOKEN not set - cannot validate Telegram data")
+        return None
     try:
-        parsed_data = dict(urllib.parse.parse_qsl(init_data))
-        data_check_string_parts = []
-        
-        for key in sorted(parsed_data.keys()):
-            if key != 'hash':
-                data_check_string_parts.append(f"{key}={parsed_data[key]}")
-        
-        data_check_string = '\n'.join(data_check_string_parts)
-        secret_key = hmac.new(
-            b"WebAppData",
-            BOT_TOKEN.encode(),
-            hashlib.sha256
-        ).digest()
-        
+        pairs = urllib.parse.parse_qsl(init_data)
+        received_hash = next((v for k, v in pairs if k == 'hash'), '')
+        data_check_string = '\n'.join(
+            f"{k}={v}" for k, v in sorted((p for p in pairs if p[0] != 'hash'), key=itemgetter(0))
+        )
         calculated_hash = hmac.new(
-            secret_key,
+            _TG_SECRET_KEY,
             data_check_string.encode(),
             hashlib.sha256
         ).hexdigest()
         
-        if calculated_hash == parsed_data.get('hash'):
-            import json
-            user_data = json.loads(parsed_data.get('user', '{}'))
+        if hmac.compare_digest(calculated_hash, received_hash):
+            user_data = json.loads(next((v for k, v in pairs if k == 'user'), '{}'))
             return user_data
         
         return None
@@ -67,16 +208,64 @@ def validate_telegram_webapp_data(init_data: str) -> dict | None:
         return None
 
 
+# Successfully validated initData -> (user, expires_at). Failures are never
+# cached, so junk headers can't evict live sessions.
+INIT_DATA_CACHE_SIZE = 4096
+INIT_DATA_MAX_AGE = 86400  # Seconds after auth_date a cached session stays valid
+_init_data_cache = OrderedDict()
+_init_data_cache_lock = threading.Lock()
+
+
+def _init_data_expiry(init_data: str) -> float:
+    """Time until which validated initData may be served from cache (0 if unknown)"""
+    auth_date = next((v for k, v in urllib.parse.parse_qsl(init_data) if k == 'auth_date'), '')
+    try:
+        return int(auth_date) + INIT_DATA_MAX_AGE
+    except ValueError:
+        return 0
+
+
 def get_user_from_request():
     """Extract and validate user from request headers"""
     init_data = request.headers.get('X-Telegram-Init-Data', '')
     if not init_data:
         return None
     
+    now = time.time()
+    with _init_data_cache_lock:
+        cached = _init_data_cache.get(init_data)
+        if cached is not None:
+            if cached[1] > now:
+                _init_data_cache.move_to_end(init_data)
+                # Hand out a copy so callers can't mutate the cached entry
+                return dict(cached[0])
+            del _init_data_cache[init_data]
+    
     user = validate_telegram_webapp_data(init_data)
+    if user is None:
+        return None
+    
+    expires_at = _init_data_expiry(init_data)
+    if expires_at > now:
+        with _init_data_cache_lock:
+            _init_data_cache[init_data] = (dict(user), expires_at)
+            _init_data_cache.move_to_end(init_data)
+            while len(_init_data_cache) > INIT_DATA_CACHE_SIZE:
+                _init_data_cache.popitem(last=False)
     return user
 
 
+def catalog_response(entry: tuple[bytes, str]) -> Response:
+    """Return a pre-serialized catalog body, or 304 if the client already has it"""
+    body, etag = entry
+    resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = CATALOG_CACHE_MAX_AGE
+    # Werkzeug's conditional handling compares weakly, so proxy-weakened ETags still get 304s
+    return resp.make_conditional(request)
+
+
 @app.route('/')
 def index():
     """Serve the mini app HTML"""
@@ -87,11 +276,7 @@ def index():
 def get_cities():
     """Get all available cities"""
     try:
-        cities_list = [
-            {'id': city_id, 'name': city_name}
-            for city_id, city_name in CITIES.items()
-        ]
-        return jsonify({'success': True, 'cities': cities_list})
+        return catalog_response(_CITIES_ENTRY)
     except Exception as e:
         logger.error(f"Error getting cities: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -101,12 +286,7 @@ def get_cities():
 def get_districts(city_id):
     """Get districts for a city"""
     try:
-        districts_dict = DISTRICTS.get(city_id, {})
-        districts_list = [
-            {'id': dist_id, 'name': dist_name}
-            for dist_id, dist_name in districts_dict.items()
-        ]
-        return jsonify({'success': True, 'districts': districts_list})
+        return catalog_response(_DISTRICTS_ENTRIES.get(city_id, _NO_DISTRICTS_ENTRY))
     except Exception as e:
         logger.error(f"Error getting districts: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -116,11 +296,7 @@ def get_districts(city_id):
 def get_product_types():
     """Get all product types with emojis"""
     try:
-        types_list = [
-            {'name': type_name, 'emoji': emoji}
-            for type_name, emoji in PRODUCT_TYPES.items()
-        ]
-        return jsonify({'success': True, 'types': types_list})
+        return catalog_response(_PRODUCT_TYPES_ENTRY)
     except Exception as e:
         logger.error(f"Error getting product types: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -135,69 +311,73 @@ def get_products():
         product_type = request.args.get('type')
         user_id = request.args.get('user_id', type=int)
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         c = conn.cursor()
         
-        query = """
-            SELECT id, city, district, product_type, size, price, 
-                   (available - reserved) as in_stock
-            FROM products 
-            WHERE available > reserved
-        """
-        params = []
+        has_city = bool(city)
+        has_district = bool(district and city)
+        has_type = bool(product_type)
         
-        if city:
-            query += " AND city = ?"
+        params = []
+        if has_city:
             params.append(CITIES.get(city, city))
-        
-        if district and city:
-            query += " AND district = ?"
-            params.append(DISTRICTS.get(city, {}).get(district, district))
-        
-        if product_type:
-            query += " AND product_type = ?"
+        if has_district:
+            params.append(DISTRICT_BY_CITY_DISTRICT.get((city, district), district))
+        if has_type:
             params.append(product_type)
         
-        query += " ORDER BY id DESC LIMIT 100"
-        
+        query = _products_sql(has_city, has_district, has_type)
         c.execute(query, params)
-        products = []
+        rows = c.fetchall()
         
-        for row in c.fetchall():
+        discounts = {}
+        if user_id:
+            discounts = get_reseller_discounts_bulk(user_id, {row['product_type'] for row in rows}, conn=conn)
+        
+        products = []
+        for row in rows:
+            # Column order matches SQL_PRODUCTS_BASE
+            pid, p_city, p_district, ptype, size, price, in_stock, media_type = row
+            price = float(price)
             product = {
-                'id': row['id'],
-                'city': row['city'],
-                'district': row['district'],
-                'type': row['product_type'],
-                'size': row['size'],
-                'price': float(row['price']),
-                'in_stock': row['in_stock'],
-                'emoji': PRODUCT_TYPES.get(row['product_type'], '📦')
+                'id': pid,
+                'city': p_city,
+                'district': p_district,
+                'type': ptype,
+                'size': size,
+                'price': price,
+                'in_stock': in_stock,
+                'emoji': PRODUCT_TYPES.get(ptype, '📦')
             }
             
             # Calculate reseller discount if user_id provided
             if user_id:
                 try:
-                    discount_percent = get_reseller_discount(user_id, row['product_type'])
+                    discount_percent = float(discounts.get(ptype, 0))
                     if discount_percent > 0:
-                        discount_amount = float(row['price']) * discount_percent / 100
-                        product['original_price'] = float(row['price'])
-                        product['price'] = float(row['price']) - discount_amount
+                        discount_amount = price * discount_percent / 100
+                        product['original_price'] = price
+                        product['price'] = price - discount_amount
                         product['discount_percent'] = discount_percent
                 except Exception as e:
                     logger.error(f"Error calculating reseller discount: {e}")
             
-            # Get first media file
-            c.execute("SELECT media_type, file_id FROM product_media WHERE product_id = ? LIMIT 1", (row['id'],))
-            media_row = c.fetchone()
-            if media_row:
-                product['media_type'] = media_row['media_type']
+            if media_type:
+                product['media_type'] = media_type
                 product['has_media'] = True
             
             products.append(product)
         
-        conn.close()
-        return jsonify({'success': True, 'products': products})
+        # Products are built above (errors still reach the except below);
+        # only serialization is streamed, a batch of products per write
+        def generate():
+            yield b'{"success":true,"products":['
+            for i in range(0, len(products), PRODUCTS_STREAM_BATCH):
+                chunk = b','.join(orjson.dumps(p) for p in products[i:i + PRODUCTS_STREAM_BATCH])
+                yield chunk if i == 0 else b',' + chunk
+            yield b']}'
+        
+        return Response(generate(), mimetype='application/json')
     
     except Exception as e:
         logger.error(f"Error getting products: {e}", exc_info=True)
@@ -211,27 +391,23 @@ def get_product_details(product_id):
         user = get_user_from_request()
         user_id = user.get('id') if user else None
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         c = conn.cursor()
         
-        c.execute("""
-            SELECT id, city, district, product_type, size, price, 
-                   original_text, (available - reserved) as in_stock
-            FROM products 
-            WHERE id = ? AND available > reserved
-        """, (product_id,))
+        c.execute(SQL_PRODUCT_DETAILS, (product_id,))
         
         row = c.fetchone()
         if not row:
             return jsonify({'success': False, 'error': 'Product not found or out of stock'}), 404
         
+        price = float(row['price'])
         product = {
             'id': row['id'],
             'city': row['city'],
             'district': row['district'],
             'type': row['product_type'],
             'size': row['size'],
-            'price': float(row['price']),
+            'price': price,
             'description': row['original_text'] or '',
             'in_stock': row['in_stock'],
             'emoji': PRODUCT_TYPES.get(row['product_type'], '📦')
@@ -240,25 +416,24 @@ def get_product_details(product_id):
         # Calculate reseller discount
         if user_id:
             try:
-                discount_percent = get_reseller_discount(user_id, row['product_type'])
+                discount_percent = float(get_reseller_discount(user_id, row['product_type']))
                 if discount_percent > 0:
-                    discount_amount = float(row['price']) * discount_percent / 100
-                    product['original_price'] = float(row['price'])
-                    product['price'] = float(row['price']) - discount_amount
+                    discount_amount = price * discount_percent / 100
+                    product['original_price'] = price
+                    product['price'] = price - discount_amount
                     product['discount_percent'] = discount_percent
             except Exception as e:
                 logger.error(f"Error calculating reseller discount: {e}")
         
         # Get all media files
-        c.execute("SELECT media_type, file_id FROM product_media WHERE product_id = ?", (product_id,))
+        c.execute(SQL_PRODUCT_MEDIA, (product_id,))
         media_rows = c.fetchall()
         product['media'] = [
             {'type': m['media_type'], 'file_id': m['file_id']}
             for m in media_rows
         ]
         
-        conn.close()
-        return jsonify({'success': True, 'product': product})
+        return Response(orjson.dumps({'success': True, 'product': product}), mimetype='application/json')
     
     except Exception as e:
         logger.error(f"Error getting product details: {e}", exc_info=True)
@@ -275,19 +450,18 @@ def get_basket():
         
         user_id = user.get('id')
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         c = conn.cursor()
         
-        c.execute("SELECT basket FROM users WHERE user_id = ?", (user_id,))
+        c.execute(SQL_USER_BASKET, (user_id,))
         row = c.fetchone()
         
         if not row or not row['basket']:
-            conn.close()
             return jsonify({'success': True, 'basket': [], 'total': 0})
         
         basket_items = []
-        import time
         current_time = time.time()
+        product_ids = []
         
         for item_str in row['basket'].split(','):
             if not item_str:
@@ -303,40 +477,49 @@ def get_basket():
             if current_time - timestamp > 900:
                 continue
             
-            c.execute("""
-                SELECT id, product_type, size, price, city, district
-                FROM products 
-                WHERE id = ?
-            """, (product_id,))
+            product_ids.append(product_id)
+        
+        # Fetch all basket products in one query, then keep basket order
+        rows_by_id = {}
+        if product_ids:
+            unique_ids = list(dict.fromkeys(product_ids))
+            placeholders = ','.join('?' * len(unique_ids))
+            c.execute(SQL_BASKET_PRODUCTS.format(placeholders=placeholders), unique_ids)
+            rows_by_id = {r['id']: r for r in c.fetchall()}
+        prod_rows = [rows_by_id[pid] for pid in product_ids if pid in rows_by_id]
+        
+        # One discount lookup for all product types in the basket
+        discounts = get_reseller_discounts_bulk(user_id, {r['product_type'] for r in prod_rows}, conn=conn)
+        
+        for prod_row in prod_rows:
+            # Column order matches SQL_BASKET_PRODUCTS
+            pid, ptype, size, price, p_city, p_district = prod_row
+            price = float(price)
+            item = {
+                'product_id': pid,
+                'type': ptype,
+                'size': size,
+                'price': price,
+                'city': p_city,
+                'district': p_district,
+                'emoji': PRODUCT_TYPES.get(ptype, '📦')
+            }
             
-            prod_row = c.fetchone()
-            if prod_row:
-                item = {
-                    'product_id': prod_row['id'],
-                    'type': prod_row['product_type'],
-                    'size': prod_row['size'],
-                    'price': float(prod_row['price']),
-                    'city': prod_row['city'],
-                    'district': prod_row['district'],
-                    'emoji': PRODUCT_TYPES.get(prod_row['product_type'], '📦')
-                }
-                
-                # Calculate reseller discount
-                try:
-                    discount_percent = get_reseller_discount(user_id, prod_row['product_type'])
-                    if discount_percent > 0:
-                        discount_amount = float(prod_row['price']) * discount_percent / 100
-                        item['original_price'] = float(prod_row['price'])
-                        item['price'] = float(prod_row['price']) - discount_amount
-                        item['discount_percent'] = discount_percent
-                except Exception:
-                    pass
-                
-                basket_items.append(item)
+            # Calculate reseller discount
+            try:
+                discount_percent = float(discounts.get(ptype, 0))
+                if discount_percent > 0:
+                    discount_amount = price * discount_percent / 100
+                    item['original_price'] = price
+                    item['price'] = price - discount_amount
+                    item['discount_percent'] = discount_percent
+            except Exception:
+                pass
+            
+            basket_items.append(item)
         
         total = sum(item['price'] for item in basket_items)
         
-        conn.close()
         return jsonify({'success': True, 'basket': basket_items, 'total': round(total, 2)})
     
     except Exception as e:
@@ -354,27 +537,27 @@ def clear_basket():
         
         user_id = user.get('id')
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         c = conn.cursor()
         
         # Get current basket
-        c.execute("SELECT basket FROM users WHERE user_id = ?", (user_id,))
+        c.execute(SQL_USER_BASKET, (user_id,))
         row = c.fetchone()
         
         if row and row['basket']:
-            # Unreserve products
-            for item_str in row['basket'].split(','):
-                if not item_str:
-                    continue
-                parts = item_str.split(':')
-                if len(parts) >= 1:
-                    product_id = int(parts[0])
-                    c.execute("UPDATE products SET reserved = reserved - 1 WHERE id = ? AND reserved > 0", (product_id,))
+            # Unreserve products - one grouped decrement per product id
+            reserved_counts = Counter(
+                int(item_str.split(':')[0])
+                for item_str in row['basket'].split(',') if item_str
+            )
+            c.executemany(
+                SQL_UNRESERVE_PRODUCT,
+                [(count, product_id) for product_id, count in reserved_counts.items()]
+            )
         
         # Clear basket
-        c.execute("UPDATE users SET basket = '' WHERE user_id = ?", (user_id,))
+        c.execute(SQL_CLEAR_BASKET, (user_id,))
         conn.commit()
-        conn.close()
         
         return jsonify({'success': True})
     
@@ -428,11 +611,10 @@ def get_user_balance():
         
         user_id = user.get('id')
         
-        conn = get_db_connection()
+        conn = get_pooled_connection()
         c = conn.cursor()
-        c.execute("SELECT balance FROM users WHERE user_id = ?", (user_id,))
+        c.execute(SQL_USER_BALANCE, (user_id,))
         row = c.fetchone()
-        conn.close()
         
         balance = float(row['balance']) if row and row['balance'] else 0.0
         
@@ -447,8 +629,11 @@ def get_user_balance():
 def serve_media(product_id, filename):
     """Serve product media files"""
     try:
-        media_path = os.path.join(MEDIA_DIR, str(product_id))
-        return send_from_directory(media_path, filename)
+        # send_from_directory does the safe join; conditional enables 304s
+        return send_from_directory(
+            MEDIA_DIR, f"{product_id}/{filename}",
+            conditional=True, max_age=MEDIA_CACHE_MAX_AGE
+        )
     except Exception as e:
         logger.error(f"Error serving media: {e}")
         return '', 404